@@ -6,19 +6,28 @@ from langgraph.graph import StateGraph
 from dotenv import load_dotenv
 
 from agent.utils.state import InputState, Configuration
-from agent.utils.nodes import supervisor_node, sql_agent_node, nosql_agent_node
+from agent.utils.nodes import (
+    supervisor_node,
+    sql_agent_node,
+    nosql_agent_node,
+    merge_results_node,
+)
 
 # Load environment variables
 load_dotenv()
 
-# Define the graph
+# Define the graph: the SQL and NoSQL branches fan out from the supervisor
+# and run concurrently before joining in the merge node
 graph = (
     StateGraph(InputState, config_schema=Configuration)
     .add_node("supervisor_node", supervisor_node)
     .add_node("sql_agent_node", sql_agent_node)
     .add_node("nosql_agent_node", nosql_agent_node)
+    .add_node("merge_results_node", merge_results_node)
     .add_edge("__start__", "supervisor_node")
     .add_edge("supervisor_node", "sql_agent_node")
     .add_edge("supervisor_node", "nosql_agent_node")
+    .add_edge("sql_agent_node", "merge_results_node")
+    .add_edge("nosql_agent_node", "merge_results_node")
     .compile(name="Chat Agent")
 )
@@ -0,0 +1,34 @@
+"""Shared thread pool executors for blocking LLM and database work."""
+
+import asyncio
+import atexit
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+# Dedicated, explicitly sized pools keep network-bound LLM calls from
+# starving DB-bound work (and vice versa) under load, instead of both
+# competing for the small default asyncio.to_thread executor.
+LLM_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_POOL", "16")),
+    thread_name_prefix="llm"
+)
+DB_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DB_POOL", "8")),
+    thread_name_prefix="db"
+)
+
+atexit.register(LLM_POOL.shutdown, wait=False)
+atexit.register(DB_POOL.shutdown, wait=False)
+
+
+async def run_in_llm_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking LLM-bound callable on the dedicated LLM pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(LLM_POOL, func, *args)
+
+
+async def run_in_db_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking database-bound callable on the dedicated DB pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(DB_POOL, func, *args)
@@ -0,0 +1,107 @@
+"""Queue-based microbatcher for LLM calls across concurrent sessions."""
+
+import asyncio
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from agent.utils.executors import run_in_llm_pool
+from agent.utils.logger import setup_logger
+
+# Initialize logger
+logger = setup_logger('llm_batcher')
+
+
+class LLMBatcher:
+    """Collects concurrent LLM requests and dispatches them as one batch.
+
+    Requests queue up until max_batch of them accumulate or max_wait_ms
+    elapses, then dispatch concurrently. This amortizes HTTP/TLS setup
+    across concurrent user sessions while callers keep a simple
+    ``await batcher.run(messages)`` API.
+    """
+
+    def __init__(self, llm: Any, max_batch: int = 8, max_wait_ms: float = 10.0):
+        self.llm = llm
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._owner_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_loop(self):
+        """Start (or restart) the dispatch loop on the current event loop.
+
+        A task stranded on a closed loop (per-test loops, dev-server
+        reloads) is never done, so the owning loop is compared too —
+        otherwise run() would await a future no loop will ever resolve.
+        """
+        loop = asyncio.get_running_loop()
+        if (self._task is not None and not self._task.done()
+                and self._owner_loop is loop):
+            return
+        if self._task is not None and not self._task.done():
+            # Best-effort cancel; the old loop may already be closed
+            try:
+                self._task.cancel()
+            except RuntimeError:
+                pass
+        self._queue = asyncio.Queue()
+        self._owner_loop = loop
+        self._task = loop.create_task(self._loop())
+
+    async def run(self, messages: Any) -> Any:
+        """Submit one request and await its response."""
+        self._ensure_loop()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((messages, future))
+        return await future
+
+    async def _drain(self):
+        """Collect a batch: block for the first item, then fill until the deadline."""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _loop(self):
+        while True:
+            batch = await self._drain()
+            if len(batch) > 1:
+                logger.info(f"Dispatching LLM batch of {len(batch)} requests")
+            responses = await asyncio.gather(
+                *[run_in_llm_pool(self.llm.invoke, messages) for messages, _ in batch],
+                return_exceptions=True
+            )
+            for (_, future), response in zip(batch, responses):
+                if future.cancelled():
+                    continue
+                if isinstance(response, Exception):
+                    future.set_exception(response)
+                else:
+                    future.set_result(response)
+
+
+# Batchers keyed by LLM configuration so all sessions share one queue
+_BATCHERS: Dict[Tuple[Any, Any], LLMBatcher] = {}
+
+
+def get_batcher(llm: Any) -> LLMBatcher:
+    """Return the shared batcher for an LLM's configuration."""
+    key = (getattr(llm, "model_name", None), getattr(llm, "temperature", None))
+    batcher = _BATCHERS.get(key)
+    if batcher is None:
+        batcher = LLMBatcher(
+            llm,
+            max_batch=int(os.getenv("LLM_BATCH_SIZE", "8")),
+            max_wait_ms=float(os.getenv("LLM_BATCH_WAIT_MS", "10"))
+        )
+        _BATCHERS[key] = batcher
+    return batcher
@@ -0,0 +1,182 @@
+"""Semantic response cache for supervisor LLM calls."""
+
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import List, Optional
+
+import numpy as np
+
+from agent.utils.logger import setup_logger
+
+# Initialize logger
+logger = setup_logger('llm_cache')
+
+# Cosine similarity above which a cached response is considered a hit
+SIMILARITY_THRESHOLD = 0.92
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+class SemanticCache:
+    """Two-tier cache for LLM responses.
+
+    Tier 1 is an exact SHA-256 lookup; tier 2 embeds the prompt and
+    returns the closest cached response when cosine similarity exceeds
+    the threshold. Entries are persisted to SQLite so the cache survives
+    restarts.
+    """
+
+    def __init__(self, db_path: Optional[str] = None,
+                 threshold: float = SIMILARITY_THRESHOLD,
+                 prompt_version: Optional[str] = None):
+        self.threshold = threshold
+        self.prompt_version = prompt_version
+        self.db_path = db_path or os.path.join(
+            os.path.dirname(__file__), "llm_cache.db"
+        )
+        self._lock = Lock()
+        self._exact = {}
+        self._embeddings: Optional[np.ndarray] = None  # (N, D) float32, normalized
+        self._responses: List[str] = []
+        self._embed_client = None
+        try:
+            self._init_store()
+            self._load()
+        except Exception as e:
+            logger.warning(f"Could not initialize semantic cache store: {str(e)}")
+
+    @contextmanager
+    def _get_connection(self):
+        """Context manager for the cache's SQLite connection."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_store(self):
+        """Create the backing table and purge entries from other prompt versions."""
+        with self._get_connection() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS semantic_cache (
+                    hash BLOB PRIMARY KEY,
+                    embedding BLOB,
+                    response TEXT,
+                    created_at REAL,
+                    prompt_version TEXT
+                )"""
+            )
+            columns = [
+                row[1] for row in conn.execute("PRAGMA table_info(semantic_cache)")
+            ]
+            if "prompt_version" not in columns:
+                conn.execute(
+                    "ALTER TABLE semantic_cache ADD COLUMN prompt_version TEXT"
+                )
+            if self.prompt_version is not None:
+                # Responses cached under an older prompt shape answer the
+                # wrong prompt; the semantic tier could still serve them
+                # on similarity alone, so drop them outright
+                deleted = conn.execute(
+                    "DELETE FROM semantic_cache WHERE prompt_version IS NOT ?",
+                    (self.prompt_version,),
+                ).rowcount
+                if deleted:
+                    logger.info(
+                        f"Purged {deleted} cached responses from other prompt versions"
+                    )
+            conn.commit()
+
+    def _load(self):
+        """Load persisted entries into the in-memory tiers."""
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                "SELECT hash, embedding, response FROM semantic_cache"
+            ).fetchall()
+
+        embeddings = []
+        for key, embedding_blob, response in rows:
+            self._exact[key] = response
+            if embedding_blob:
+                embeddings.append(np.frombuffer(embedding_blob, dtype=np.float32))
+                self._responses.append(response)
+        if embeddings:
+            self._embeddings = np.vstack(embeddings)
+        logger.info(f"Loaded {len(rows)} cached LLM responses")
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        """Hash the prompt text for the exact-match tier."""
+        return hashlib.sha256(text.encode()).digest()
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed text, returning a normalized float32 vector or None on failure."""
+        try:
+            if self._embed_client is None:
+                from openai import OpenAI
+                self._embed_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            result = self._embed_client.embeddings.create(
+                model=EMBEDDING_MODEL, input=text
+            )
+            vector = np.array(result.data[0].embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else vector
+        except Exception as e:
+            logger.warning(f"Embedding failed, skipping semantic tier: {str(e)}")
+            return None
+
+    def lookup(self, text: str) -> Optional[str]:
+        """Return a cached response for text, or None on a miss."""
+        # Tier 1: exact hash match
+        cached = self._exact.get(self._key(text))
+        if cached is not None:
+            logger.info("Semantic cache hit (exact match)")
+            return cached
+
+        # Tier 2: cosine similarity against cached embeddings
+        with self._lock:
+            embeddings = self._embeddings
+        if embeddings is None:
+            return None
+        query = self._embed(text)
+        if query is None:
+            return None
+        similarities = embeddings @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] > self.threshold:
+            logger.info(
+                f"Semantic cache hit (similarity={similarities[best]:.3f})"
+            )
+            return self._responses[best]
+        return None
+
+    def store(self, text: str, response: str):
+        """Cache a response under both the exact and semantic tiers."""
+        key = self._key(text)
+        embedding = self._embed(text)
+        with self._lock:
+            self._exact[key] = response
+            if embedding is not None:
+                if self._embeddings is None:
+                    self._embeddings = embedding[np.newaxis, :]
+                else:
+                    self._embeddings = np.vstack([self._embeddings, embedding])
+                self._responses.append(response)
+        try:
+            with self._get_connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO semantic_cache VALUES (?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        embedding.tobytes() if embedding is not None else None,
+                        response,
+                        time.time(),
+                        self.prompt_version,
+                    ),
+                )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not persist cache entry: {str(e)}")
@@ -1,14 +1,66 @@
+import asyncio
+import atexit
+import os
+import threading
 import pymongo
+from motor.motor_asyncio import AsyncIOMotorClient
 from typing import List, Dict, Any, Optional, Union
 import json
 from datetime import datetime
 from bson import ObjectId
+from agent.utils.executors import run_in_llm_pool
 from agent.utils.llm_config import llm
 from agent.utils.logger import setup_logger
 
 # Initialize logger
 logger = setup_logger('nosql_agent')
 
+# Process-wide Mongo clients keyed by (connection string, event loop).
+# The Motor client keeps its own connection pool, so reusing one instance
+# avoids repeated DNS, TLS handshake and topology discovery on every
+# request — but the client binds to the loop it was created on, so each
+# loop (per-test loops, dev-server reloads) needs its own.
+_MONGO_CLIENTS: Dict[Any, AsyncIOMotorClient] = {}
+_MONGO_CLIENTS_LOCK = threading.Lock()
+
+
+def get_mongo_client(connection_string: str) -> AsyncIOMotorClient:
+    """Return the pooled async Mongo client for the current event loop."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _MONGO_CLIENTS_LOCK:
+        # Drop clients stranded on loops that have since closed; every
+        # operation on them would fail with 'Event loop is closed'
+        for key in [k for k in _MONGO_CLIENTS
+                    if k[1] is not None and k[1].is_closed()]:
+            try:
+                _MONGO_CLIENTS.pop(key).close()
+            except Exception:
+                pass
+        key = (connection_string, loop)
+        client = _MONGO_CLIENTS.get(key)
+        if client is None:
+            logger.info(f"Creating pooled Mongo client for: {connection_string}")
+            client = AsyncIOMotorClient(
+                connection_string,
+                maxPoolSize=50,
+                minPoolSize=5,
+                serverSelectionTimeoutMS=3000
+            )
+            _MONGO_CLIENTS[key] = client
+        return client
+
+
+def _close_mongo_clients():
+    """Close all pooled clients at interpreter shutdown."""
+    for client in _MONGO_CLIENTS.values():
+        client.close()
+
+
+atexit.register(_close_mongo_clients)
+
 # Custom JSON encoder for MongoDB ObjectId and datetime serialization
 class MongoJSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -19,41 +71,50 @@ class MongoJSONEncoder(json.JSONEncoder):
         return super().default(obj)
 
 class GeneralizedNoSQLAgent:
-    def __init__(self, connection_string: str, database_name: Optional[str]):
+    def __init__(self, connection_string: Optional[str] = None,
+                 database_name: Optional[str] = None,
+                 client: Optional[AsyncIOMotorClient] = None):
         """
         Initialize the Generalized NoSQL agent with MongoDB connection.
-        
+
         Args:
-            connection_string (str): MongoDB connection string
+            connection_string (str, optional): MongoDB connection string;
+                defaults to the NOSQL_CONNECTION_STRING environment variable
             database_name (str, optional): Name of the database to connect to initially
+            client (AsyncIOMotorClient, optional): Injected client; defaults to
+                the shared pooled client for the connection string
         """
+        connection_string = connection_string or os.getenv(
+            "NOSQL_CONNECTION_STRING", "mongodb://localhost:27017"
+        )
         logger.info(f"Initializing Generalized NoSQL agent with connection string: {connection_string}")
-        self.client = pymongo.MongoClient(connection_string)
+        self.client = client if client is not None else get_mongo_client(connection_string)
         self.current_db = None
-        
-        # If database_name is provided, connect to it
+
+        # If database_name is provided, select it; existence is verified
+        # lazily on first use since __init__ cannot await
         if database_name:
-            self.use_database(database_name)
-            
+            self.current_db = self.client[database_name]
+
         logger.info("Generalized NoSQL agent initialized successfully")
-    
-    def list_databases(self) -> List[str]:
+
+    async def list_databases(self) -> List[str]:
         """
         List all available databases.
-        
+
         Returns:
             List[str]: List of database names
         """
         logger.info("Listing all databases")
-        return self.client.list_database_names()
-    
-    def use_database(self, database_name: str) -> bool:
+        return await self.client.list_database_names()
+
+    async def use_database(self, database_name: str) -> bool:
         """
         Switch to a specific database.
-        
+
         Args:
             database_name (str): Name of the database to use
-            
+
         Returns:
             bool: Success status
         """
@@ -61,133 +122,133 @@ class GeneralizedNoSQLAgent:
         try:
             self.current_db = self.client[database_name]
             # Verify the database exists by listing collections
-            self.current_db.list_collection_names()
+            await self.current_db.list_collection_names()
             return True
         except Exception as e:
             logger.warning(f"Error accessing database {database_name}: {str(e)}")
             self.current_db = None
             return False
-    
-    def list_collections(self) -> List[str]:
+
+    async def list_collections(self) -> List[str]:
         """
         List all collections in the current database.
-        
+
         Returns:
             List[str]: List of collection names
-        
+
         Raises:
             ValueError: If no database is selected
         """
         if self.current_db is None:
             raise ValueError("No database selected. Call use_database() first.")
-            
+
         logger.info(f"Listing collections in database: {self.current_db.name}")
-        return self.current_db.list_collection_names()
-    
-    def create_collection(self, collection_name: str) -> bool:
+        return await self.current_db.list_collection_names()
+
+    async def create_collection(self, collection_name: str) -> bool:
         """
         Create a new collection in the current database.
-        
+
         Args:
             collection_name (str): Name of the collection to create
-            
+
         Returns:
             bool: Success status
-            
+
         Raises:
             ValueError: If no database is selected
         """
         if self.current_db is None:
             raise ValueError("No database selected. Call use_database() first.")
-            
+
         logger.info(f"Creating collection: {collection_name}")
         try:
-            self.current_db.create_collection(collection_name)
+            await self.current_db.create_collection(collection_name)
             return True
         except pymongo.errors.CollectionInvalid:
             logger.warning(f"Collection already exists: {collection_name}")
             return False
-    
-    def drop_collection(self, collection_name: str) -> bool:
+
+    async def drop_collection(self, collection_name: str) -> bool:
         """
         Drop a collection from the current database.
-        
+
         Args:
             collection_name (str): Name of the collection to drop
-            
+
         Returns:
             bool: Success status
-            
+
         Raises:
             ValueError: If no database is selected
         """
         if self.current_db is None:
             raise ValueError("No database selected. Call use_database() first.")
-            
+
         logger.info(f"Dropping collection: {collection_name}")
         try:
-            self.current_db.drop_collection(collection_name)
+            await self.current_db.drop_collection(collection_name)
             return True
         except Exception as e:
             logger.error(f"Error dropping collection: {str(e)}")
             return False
-    
-    def get_collection_schema(self, collection_name: str) -> Dict[str, str]:
+
+    async def get_collection_schema(self, collection_name: str) -> Dict[str, str]:
         """
         Infer the schema of a collection from sample documents.
-        
+
         Args:
             collection_name (str): Name of the collection
-            
+
         Returns:
             Dict[str, str]: Inferred schema with field names and types
-            
+
         Raises:
             ValueError: If no database is selected or collection doesn't exist
         """
         if self.current_db is None:
             raise ValueError("No database selected. Call use_database() first.")
-            
-        if collection_name not in self.current_db.list_collection_names():
+
+        if collection_name not in await self.current_db.list_collection_names():
             raise ValueError(f"Collection does not exist: {collection_name}")
-            
+
         logger.debug(f"Inferring schema for collection: {collection_name}")
         collection = self.current_db[collection_name]
-        
+
         # Sample up to 100 documents to infer schema
         schema = {}
-        for doc in collection.find().limit(100):
+        async for doc in collection.find().limit(100):
             for key, value in doc.items():
                 if key not in schema:
                     schema[key] = type(value).__name__
-        
+
         return schema
-    
-    def get_all_schemas(self) -> Dict[str, Dict[str, str]]:
+
+    async def get_all_schemas(self) -> Dict[str, Dict[str, str]]:
         """
         Get schemas for all collections in the current database.
-        
+
         Returns:
             Dict[str, Dict[str, str]]: Collection schemas
-            
+
         Raises:
             ValueError: If no database is selected
         """
         if self.current_db is None:
             raise ValueError("No database selected. Call use_database() first.")
-            
+
         logger.debug("Retrieving schemas for all collections")
         schemas = {}
-        
-        for collection_name in self.current_db.list_collection_names():
+
+        for collection_name in await self.current_db.list_collection_names():
             try:
-                schemas[collection_name] = self.get_collection_schema(collection_name)
+                schemas[collection_name] = await self.get_collection_schema(collection_name)
             except Exception as e:
                 logger.warning(f"Could not retrieve schema for collection {collection_name}: {str(e)}")
-                
+
         return schemas
 
-    def _generate_mongo_query(self, prompt: str) -> Dict[str, Any]:
+    async def _generate_mongo_query(self, prompt: str) -> Dict[str, Any]:
         """
         Generate MongoDB query using LLM based on the prompt and current database schema.
         
@@ -207,7 +268,7 @@ class GeneralizedNoSQLAgent:
         
         # Get schemas to provide context for the LLM
         try:
-            schemas = self.get_all_schemas()
+            schemas = await self.get_all_schemas()
         except Exception as e:
             logger.warning(f"Could not retrieve all schemas: {str(e)}")
             schemas = {}
@@ -328,7 +389,7 @@ Examples:
         ]
         
         try:
-            response = llm.invoke(messages)
+            response = await run_in_llm_pool(llm.invoke, messages)
             response_content = response.content.strip()
             
             # Try to parse the JSON response
@@ -391,63 +452,63 @@ Examples:
             logger.error(f"Error generating MongoDB query: {str(e)}", exc_info=True)
             raise
 
-    def execute_query(self, prompt: str) -> Dict[str, Any]:
+    async def execute_query(self, prompt: str) -> Dict[str, Any]:
         """
         Execute a MongoDB query based on the natural language prompt.
-        
+
         Args:
             prompt (str): Natural language description of the desired operation
-            
+
         Returns:
             Dict[str, Any]: Query results and metadata
         """
         logger.info(f"Executing query for prompt: {prompt}")
         try:
             # Generate MongoDB query from the prompt
-            query_spec = self._generate_mongo_query(prompt)
-            
+            query_spec = await self._generate_mongo_query(prompt)
+
             # Check if this is a database operation
             if query_spec.get("operation") == "db_operation":
-                return self._handle_db_operation(query_spec)
-            
+                return await self._handle_db_operation(query_spec)
+
             # Ensure we have a database selected
             if self.current_db is None:
                 return {
                     "status": "error",
                     "message": "No database selected. Use 'use database [name]' first."
                 }
-            
+
             collection_name = query_spec["collection"]
-            
+
             # Create collection if it doesn't exist (for insert operations)
-            if collection_name not in self.current_db.list_collection_names():
+            if collection_name not in await self.current_db.list_collection_names():
                 if query_spec["operation"] == "insert":
                     logger.info(f"Collection {collection_name} does not exist. Creating it.")
-                    self.create_collection(collection_name)
+                    await self.create_collection(collection_name)
                 else:
                     return {
                         "status": "error",
                         "message": f"Collection {collection_name} does not exist"
                     }
-            
+
             collection = self.current_db[collection_name]
             logger.debug(f"Using collection: {collection_name}")
-            
+
             # Execute the appropriate operation
             if query_spec["operation"] == "find":
-                return self._execute_find(collection, query_spec)
-                
+                return await self._execute_find(collection, query_spec)
+
             elif query_spec["operation"] == "aggregate":
-                return self._execute_aggregate(collection, query_spec)
-                
+                return await self._execute_aggregate(collection, query_spec)
+
             elif query_spec["operation"] == "insert":
-                return self._execute_insert(collection, query_spec)
-                
+                return await self._execute_insert(collection, query_spec)
+
             elif query_spec["operation"] == "update":
-                return self._execute_update(collection, query_spec)
-                
+                return await self._execute_update(collection, query_spec)
+
             elif query_spec["operation"] == "delete":
-                return self._execute_delete(collection, query_spec)
+                return await self._execute_delete(collection, query_spec)
                 
             else:
                 logger.error(f"Unsupported operation: {query_spec['operation']}")
@@ -464,42 +525,42 @@ Examples:
                 "query_spec": query_spec if 'query_spec' in locals() else None
             }
     
-    def _handle_db_operation(self, query_spec: Dict[str, Any]) -> Dict[str, Any]:
+    async def _handle_db_operation(self, query_spec: Dict[str, Any]) -> Dict[str, Any]:
         """
         Handle database management operations.
-        
+
         Args:
             query_spec (Dict[str, Any]): Database operation specification
-            
+
         Returns:
             Dict[str, Any]: Operation results
         """
         action = query_spec.get("action")
-        
+
         if action == "use_db":
             database = query_spec.get("database")
             if not database:
                 return {"status": "error", "message": "No database specified"}
-            
-            self.use_database(database)
+
+            await self.use_database(database)
             return {
                 "status": "success",
                 "message": f"Switched to database: {database}"
             }
-            
+
         elif action == "list_dbs":
-            databases = self.list_databases()
+            databases = await self.list_databases()
             return {
                 "status": "success",
                 "databases": databases,
                 "count": len(databases)
             }
-            
+
         elif action == "list_collections":
             if self.current_db is None:
                 return {"status": "error", "message": "No database selected"}
-            
-            collections = self.list_collections()
+
+            collections = await self.list_collections()
             return {
                 "status": "success",
                 "database": self.current_db.name,
@@ -515,7 +576,7 @@ Examples:
             if not collection_name:
                 return {"status": "error", "message": "No collection name specified"}
                 
-            success = self.create_collection(collection_name)
+            success = await self.create_collection(collection_name)
             return {
                 "status": "success" if success else "error",
                 "message": f"Collection {collection_name} {'created' if success else 'already exists'}"
@@ -529,7 +590,7 @@ Examples:
             if not collection_name:
                 return {"status": "error", "message": "No collection name specified"}
                 
-            success = self.drop_collection(collection_name)
+            success = await self.drop_collection(collection_name)
             return {
                 "status": "success" if success else "error",
                 "message": f"Collection {collection_name} {'dropped' if success else 'could not be dropped'}"
@@ -542,7 +603,7 @@ Examples:
             collection_name = query_spec.get("collection")
             if collection_name:
                 try:
-                    schema = self.get_collection_schema(collection_name)
+                    schema = await self.get_collection_schema(collection_name)
                     return {
                         "status": "success",
                         "collection": collection_name,
@@ -552,7 +613,7 @@ Examples:
                     return {"status": "error", "message": str(e)}
             else:
                 try:
-                    schemas = self.get_all_schemas()
+                    schemas = await self.get_all_schemas()
                     return {
                         "status": "success",
                         "schemas": schemas
@@ -566,19 +627,19 @@ Examples:
                 "message": f"Unsupported database operation: {action}"
             }
     
-    def _execute_find(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_find(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a find operation."""
         logger.debug(f"Executing find operation with query: {query_spec['query']}")
-        
+
         # Extract options if provided
         limit = query_spec.get("limit", 0)  # 0 means no limit
         skip = query_spec.get("skip", 0)
         sort = query_spec.get("sort", None)
         projection = query_spec.get("projection", None)
-        
+
         # Execute the query with options
         cursor = collection.find(query_spec["query"], projection)
-        
+
         # Apply options
         if skip > 0:
             cursor = cursor.skip(skip)
@@ -586,8 +647,8 @@ Examples:
             cursor = cursor.limit(limit)
         if sort:
             cursor = cursor.sort(sort)
-            
-        results = list(cursor)
+
+        results = await cursor.to_list(length=None)
         
         # Convert ObjectId to string for JSON serialization
         for result in results:
@@ -603,11 +664,11 @@ Examples:
             "count": len(results)
         }
     
-    def _execute_aggregate(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_aggregate(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
         """Execute an aggregate operation."""
         logger.debug(f"Executing aggregate operation with pipeline: {query_spec['pipeline']}")
-        
-        results = list(collection.aggregate(query_spec["pipeline"]))
+
+        results = await collection.aggregate(query_spec["pipeline"]).to_list(length=None)
         
         # Convert ObjectId to string for JSON serialization
         for result in results:
@@ -623,14 +684,14 @@ Examples:
             "count": len(results)
         }
     
-    def _execute_insert(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_insert(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
         """Execute an insert operation."""
         document = query_spec["document"]
         logger.debug(f"Executing insert operation with document: {document}")
-        
+
         # Check if we're inserting a single document or multiple
         if isinstance(document, list):
-            result = collection.insert_many(document)
+            result = await collection.insert_many(document)
             inserted_ids = [str(id) for id in result.inserted_ids]
             logger.info(f"Insert operation completed. Inserted {len(inserted_ids)} documents")
             return {
@@ -640,7 +701,7 @@ Examples:
                 "inserted_ids": inserted_ids
             }
         else:
-            result = collection.insert_one(document)
+            result = await collection.insert_one(document)
             inserted_id = str(result.inserted_id)
             logger.info(f"Insert operation completed. Inserted ID: {inserted_id}")
             return {
@@ -650,7 +711,7 @@ Examples:
                 "inserted_id": inserted_id
             }
     
-    def _execute_update(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_update(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
         """Execute an update operation."""
         filter_dict = query_spec["filter"]
         update_dict = query_spec["update"]
@@ -661,7 +722,7 @@ Examples:
         # Check if we want to update one or many
         update_one = query_spec.get("update_one", False)
         if update_one:
-            result = collection.update_one(filter_dict, update_dict, upsert=upsert)
+            result = await collection.update_one(filter_dict, update_dict, upsert=upsert)
             logger.info(f"Update one operation completed. Modified {result.modified_count} document")
             return {
                 "status": "success",
@@ -673,7 +734,7 @@ Examples:
                 "upserted_id": str(result.upserted_id) if result.upserted_id else None
             }
         else:
-            result = collection.update_many(filter_dict, update_dict, upsert=upsert)
+            result = await collection.update_many(filter_dict, update_dict, upsert=upsert)
             logger.info(f"Update many operation completed. Modified {result.modified_count} documents")
             return {
                 "status": "success",
@@ -685,7 +746,7 @@ Examples:
                 "upserted_id": str(result.upserted_id) if result.upserted_id else None
             }
     
-    def _execute_delete(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_delete(self, collection, query_spec: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a delete operation."""
         filter_dict = query_spec["filter"]
         logger.debug(f"Executing delete operation with filter: {filter_dict}")
@@ -700,7 +761,7 @@ Examples:
         # Check if we want to delete one or many
         delete_one = query_spec.get("delete_one", False)
         if delete_one:
-            result = collection.delete_one(filter_dict)
+            result = await collection.delete_one(filter_dict)
             logger.info(f"Delete one operation completed. Deleted {result.deleted_count} document")
             return {
                 "status": "success",
@@ -709,7 +770,7 @@ Examples:
                 "deleted_count": result.deleted_count
             }
         else:
-            result = collection.delete_many(filter_dict)
+            result = await collection.delete_many(filter_dict)
             logger.info(f"Delete many operation completed. Deleted {result.deleted_count} documents")
             return {
                 "status": "success",
@@ -719,22 +780,21 @@ Examples:
             }
     
     def close(self):
-        """Close the MongoDB connection."""
-        logger.info("Closing MongoDB connection")
-        self.client.close()
+        """Release the agent; the shared pooled client stays open for reuse."""
+        logger.debug("Releasing NoSQL agent (pooled MongoClient stays open)")
 
-def main():
+async def main():
     """Main function to demonstrate the Generalized NoSQL agent usage with user_management_db."""
     try:
         # Initialize agent and connect to user_management_db
         # print("\n=== Initializing NoSQL Agent with user_management_db ===")
         agent = GeneralizedNoSQLAgent()
-        # result = agent.execute_query("use database user_management_db")
+        # result = await agent.execute_query("use database user_management_db")
         # print("Database connection result:", json.dumps(result, indent=2, cls=MongoJSONEncoder))
-        
+
         # List available collections
         print("\n=== Available Collections ===")
-        result = agent.execute_query("Retrieve the version of the system from the NoSQL database")
+        result = await agent.execute_query("Retrieve the version of the system from the NoSQL database")
         print("Collections:", json.dumps(result, indent=2, cls=MongoJSONEncoder))
         
         # # Test Case 1: Query Users
@@ -789,4 +849,4 @@ def main():
             agent.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
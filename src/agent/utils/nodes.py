@@ -5,63 +5,148 @@ from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 import os
-import json
+import hashlib
 import logging
+import string
 import asyncio
-from functools import partial
-import sqlite3
-from contextlib import contextmanager
-from .state import InputState, Configuration
+import aiosqlite
+import orjson
+from cachetools import TTLCache
+from functools import lru_cache, partial
+from .executors import run_in_db_pool, run_in_llm_pool
+from .state import InputState, Configuration, decode_message, RESULTS_RESET
+from .llm_batcher import get_batcher
+from .llm_cache import SemanticCache
+from .persistent_cache import PersistentLLMCache
+from .schema_cache import cached_schema_async
 from .sql_agent import SQLAgent
+from .sqlite_pool import PRAGMAS
 from agent.utils.logger import setup_logger
-from agent.utils.no_sql_agent import GeneralizedNoSQLAgent, MongoJSONEncoder
+from agent.utils.no_sql_agent import GeneralizedNoSQLAgent
 
 logger = logging.getLogger(__name__)
 
 
-def get_llm(config: Configuration) -> ChatOpenAI:
-    """Initialize and return the LLM with configuration."""
+def _json(obj: Any) -> str:
+    """Serialize for the hot path: orjson, no pretty-printing."""
+    return orjson.dumps(obj, default=str).decode()
+
+
+# Bump when the supervisor prompt changes so stale cached plans are not served
+PROMPT_VERSION = "v2"
+
+# Shared semantic cache for supervisor task analyses; entries from other
+# prompt versions are purged on startup
+semantic_cache = SemanticCache(prompt_version=PROMPT_VERSION)
+
+# Disk-backed L2 cache of supervisor outputs, shared across worker processes
+persistent_cache = PersistentLLMCache()
+
+# Stable instruction prefix kept byte-identical across calls so provider-side
+# prompt prefix caching can hit; the schemas and user query travel in their
+# own messages
+SUPERVISOR_SYSTEM_PROMPT = """You are a smart data analysis expert. Analyze the user's query and determine what data needs to be gathered from SQL and NoSQL databases.
+
+Your task is to:
+1. Analyze the query to determine if it requires data from SQL, NoSQL, or both databases
+2. Create appropriate tasks for each required database type
+3. For taskDefinition about "all tables" or "all data", you MUST create tasks for both SQL and NoSQL databases
+4. Assign priorities based on the logical order of operations (e.g., if NoSQL data depends on SQL data, SQL task gets higher priority)
+
+Respond with a JSON object in this format:
+{
+    "tasks": [
+        {
+            "agent": "sql_agent" or "nosql_agent" or "drive_agent",
+            "taskDefinition": "a clear description of the task for which a query is needed",
+            "purpose": "brief explanation of why this query is needed",
+            "priority": 1-5,  # Higher number means higher priority
+            "dependencies": ["list of task indices this task depends on"]
+        }
+    ],
+    "context": {
+        "required_data": ["list of data points needed"],
+        "relationships": ["how the data points relate to each other"],
+        "error_handling": {
+            "retry_count": 3,
+            "fallback_strategy": "description of fallback approach"
+        }
+    }
+}"""
+
+# Schema block compiled once; only the two schema slots are substituted
+# per call instead of rebuilding the surrounding text
+_SCHEMA_TMPL = string.Template(
+    "Available Database Schemas:\n"
+    "SQL Schema:\n"
+    "$sql\n\n"
+    "NoSQL Schema:\n"
+    "$nosql"
+)
+
+# Exact-match L1 cache of full supervisor outputs, keyed by
+# (prompt version, user message, schema hash)
+_L1_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+
+
+@lru_cache(maxsize=8)
+def _schema_hash(sql_schema: str, nosql_repr: str) -> str:
+    """Hash the schema context once per distinct schema load."""
+    return hashlib.sha256(f"{sql_schema}|{nosql_repr}".encode()).hexdigest()
+
+
+@lru_cache(maxsize=8)
+def _llm_cached(model: str, temperature: float, api_key: str) -> ChatOpenAI:
+    """Build a ChatOpenAI client once per configuration.
+
+    Reusing the instance keeps its underlying httpx keep-alive pool warm
+    instead of rebuilding the client (and re-reading env) on every call.
+    JSON mode guarantees parseable output, removing json.loads failure
+    branches and their retry cost.
+    """
     return ChatOpenAI(
-        model=config.get("model_name", "gpt-3.5-turbo"),
-        temperature=config.get("temperature", 0.7),
-        api_key=os.getenv("OPENAI_API_KEY")
+        model=model,
+        temperature=temperature,
+        api_key=api_key,
+        model_kwargs={"response_format": {"type": "json_object"}}
     )
 
 
-@contextmanager
-def get_sqlite_connection(db_path: str):
-    """Context manager for SQLite connections."""
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+def get_llm(config: Configuration) -> ChatOpenAI:
+    """Return the memoized LLM for the given configuration."""
+    return _llm_cached(
+        config.get("model_name", "gpt-3.5-turbo"),
+        config.get("temperature", 0.7),
+        os.getenv("OPENAI_API_KEY")
+    )
 
 
-def get_table_schema(db_path: str) -> str:
+async def get_table_schema(db_path: str) -> str:
     """Get the schema of the database tables."""
-    with get_sqlite_connection(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT sql FROM sqlite_master WHERE type='table'")
-        schemas = cursor.fetchall()
+    conn = await aiosqlite.connect(db_path)
+    try:
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        cursor = await conn.execute("SELECT sql FROM sqlite_master WHERE type='table'")
+        schemas = await cursor.fetchall()
         return "\n".join([schema[0] for schema in schemas])
+    finally:
+        await conn.close()
 
 
-def get_mongo_schema() -> Dict[str, Any]:
-    """Get MongoDB schema in a thread-safe way."""
+async def get_mongo_schema() -> Dict[str, Any]:
+    """Get MongoDB schema via the async Motor client."""
     try:
         nosql_agent = GeneralizedNoSQLAgent()
-        available_dbs = nosql_agent.list_databases()
-        
+        available_dbs = await nosql_agent.list_databases()
+
         if available_dbs:
             db_name = available_dbs[0]
         else:
             db_name = "user_management_db"
-            
-        nosql_agent.use_database(db_name)
-        schemas = nosql_agent.get_all_schemas()
-        nosql_agent.close()
+
+        await nosql_agent.use_database(db_name)
+        schemas = await nosql_agent.get_all_schemas()
         return schemas
     except Exception as e:
         logger.error(f"Error getting MongoDB schema: {str(e)}", exc_info=True)
@@ -71,16 +156,24 @@ def get_mongo_schema() -> Dict[str, Any]:
 async def get_schema_context():
     """Get the schema context from both SQL and NoSQL databases."""
     try:
-        # Get SQL schema
         db_path = os.path.join(os.path.dirname(__file__), "sales.db")
         logger.info(f"Attempting to connect to SQL database at: {db_path}")
-        
-        # Get SQL schema in a thread-safe way
-        sql_schema = await asyncio.to_thread(get_table_schema, db_path)
-
-        # Get MongoDB schema in a thread-safe way
         logger.info("Attempting to connect to MongoDB")
-        nosql_schemas = await asyncio.to_thread(get_mongo_schema)
+
+        # Fetch both schemas concurrently, each served from the TTL cache;
+        # return_exceptions so one source failing doesn't cancel the other
+        sql_schema, nosql_schemas = await asyncio.gather(
+            cached_schema_async(f"sqlite:{db_path}", partial(get_table_schema, db_path)),
+            cached_schema_async("mongo:default", get_mongo_schema),
+            return_exceptions=True
+        )
+
+        if isinstance(sql_schema, Exception):
+            logger.error(f"Error getting SQL schema: {str(sql_schema)}", exc_info=sql_schema)
+            sql_schema = "Error retrieving SQL schema"
+        if isinstance(nosql_schemas, Exception):
+            logger.error(f"Error getting MongoDB schema: {str(nosql_schemas)}", exc_info=nosql_schemas)
+            nosql_schemas = "Error retrieving NoSQL schemas"
 
         return {
             "sql_schema": sql_schema,
@@ -99,60 +192,64 @@ async def supervisor_node(state: InputState, config: RunnableConfig) -> Dict[str
     """Supervisor node that analyzes user query and creates structured tasks for agents."""
     try:
         # Get the last message and schema context
-        last_message = state["messages"][-1]["content"]
+        last_message = decode_message(state["messages"][-1]).content
         schema_context = await get_schema_context()
         
-        # Create a prompt for the LLM to analyze the query and create structured tasks
-        system_prompt = f"""You are a smart data analysis expert. Analyze the user's query and determine what data needs to be gathered from SQL and NoSQL databases.
-
-Available Database Schemas:
-SQL Schema:
-{schema_context.get('sql_schema', 'No SQL schema available')}
-
-NoSQL Schema:
-{schema_context.get('nosql_schemas', 'No NoSQL schema available')}
-
-User Query: {last_message}
-
-Your task is to:
-1. Analyze the query to determine if it requires data from SQL, NoSQL, or both databases
-2. Create appropriate tasks for each required database type
-3. For taskDefinition about "all tables" or "all data", you MUST create tasks for both SQL and NoSQL databases
-4. Assign priorities based on the logical order of operations (e.g., if NoSQL data depends on SQL data, SQL task gets higher priority)
-
-Respond with a JSON object in this format:
-{{
-    "tasks": [
-        {{
-            "agent": "sql_agent" or "nosql_agent" or "drive_agent",
-            "taskDefinition": "a clear description of the task for which a query is needed",
-            "purpose": "brief explanation of why this query is needed",
-            "priority": 1-5,  # Higher number means higher priority
-            "dependencies": ["list of task indices this task depends on"]
-        }}
-    ],
-    "context": {{
-        "required_data": ["list of data points needed"],
-        "relationships": ["how the data points relate to each other"],
-        "error_handling": {{
-            "retry_count": 3,
-            "fallback_strategy": "description of fallback approach"
-        }}
-    }}
-}}"""
+        # Stable instructions, then the schema block (changes only when the
+        # schemas change), then the dynamic user query
+        schema_message = _SCHEMA_TMPL.substitute(
+            sql=schema_context.get('sql_schema', 'No SQL schema available'),
+            nosql=schema_context.get('nosql_schemas', 'No NoSQL schema available')
+        )
 
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": SUPERVISOR_SYSTEM_PROMPT},
+            {"role": "system", "content": schema_message},
             {"role": "user", "content": last_message}
         ]
         
-        # Initialize LLM with config
-        llm = get_llm(config)
-        
-        # Move LLM call to a separate thread
-        response = await asyncio.to_thread(llm.invoke, messages)
-        task_analysis = json.loads(response.content)
+        # Key the caches on the user message plus a hash of the schemas so
+        # schema changes invalidate stale plans
+        schema_hash = _schema_hash(
+            str(schema_context.get('sql_schema', '')),
+            str(schema_context.get('nosql_schemas', ''))
+        )
+        cache_text = f"{PROMPT_VERSION}|{last_message}|{schema_hash}"
+
+        # L1: exact-match lookup of a previously built output state
+        l1_key = hashlib.sha256(
+            f"{PROMPT_VERSION}|{last_message}|{schema_hash}".encode()
+        ).digest()
+        cached_state = _L1_CACHE.get(l1_key)
+        if cached_state is not None:
+            logger.info("Supervisor L1 cache hit")
+            return cached_state
+
+        # L2: disk-backed lookup so warm entries survive restarts and are
+        # shared between worker processes
+        cached_state = await run_in_db_pool(persistent_cache.lookup, l1_key)
+        if cached_state is not None:
+            _L1_CACHE[l1_key] = cached_state
+            return cached_state
+
+        cached_response = await run_in_llm_pool(semantic_cache.lookup, cache_text)
+        if cached_response is not None:
+            task_analysis = orjson.loads(cached_response)
+        else:
+            # Initialize LLM with config
+            llm = get_llm(config)
+
+            # Submit through the shared microbatcher so concurrent sessions
+            # dispatch together
+            response = await get_batcher(llm).run(messages)
+            task_analysis = orjson.loads(response.content)
+            await run_in_llm_pool(semantic_cache.store, cache_text, response.content)
         
+        # Dependencies refer to positions in the task list as the LLM
+        # emitted it; pin each task's index before sorting reorders them
+        for index, task in enumerate(task_analysis["tasks"]):
+            task["index"] = index
+
         # Sort tasks by priority
         sorted_tasks = sorted(task_analysis["tasks"], key=lambda x: x["priority"], reverse=True)
         
@@ -161,7 +258,7 @@ Respond with a JSON object in this format:
             "messages": [
                 {
                     "role": "assistant",
-                    "content": json.dumps({
+                    "content": _json({
                         "tasks": sorted_tasks,  # Return all tasks, not just the first one
                         "context": task_analysis["context"],
                         "current_task_index": 0,  # Start with the first task
@@ -171,11 +268,18 @@ Respond with a JSON object in this format:
                             "task_types": list(set(task["agent"] for task in sorted_tasks)),
                             "highest_priority_task": sorted_tasks[0] if sorted_tasks else None
                         }
-                    }, indent=2)
+                    })
                 }
-            ]
+            ],
+            # Start this turn's results afresh so checkpointed entries
+            # from previous turns aren't re-merged
+            "results": [RESULTS_RESET]
         }
-        
+
+        _L1_CACHE[l1_key] = output_state
+        await run_in_db_pool(
+            persistent_cache.store, l1_key, PROMPT_VERSION, output_state
+        )
         return output_state
     except Exception as e:
         logger.error(f"Error in supervisor_node: {str(e)}", exc_info=True)
@@ -183,83 +287,118 @@ Respond with a JSON object in this format:
             "messages": [
                 {
                     "role": "assistant",
-                    "content": json.dumps({
+                    "content": _json({
                         "status": "error",
                         "error": f"Failed to analyze query: {str(e)}",
                         "retry_count": 0
-                    }, indent=2)
+                    })
                 }
-            ]
+            ],
+            "results": [RESULTS_RESET]
         }
 
 
+def _dependency_layers(tasks: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Group tasks into layers so dependencies complete before dependents run.
+
+    Dependencies are resolved against each task's "index" field — its
+    position in the original supervisor plan — since priority sorting
+    and per-agent filtering have reordered the list by the time it gets
+    here. Tasks within a layer are independent of each other and can
+    execute concurrently. Dependencies referencing tasks outside the
+    list (another agent's, or forming a cycle) are treated as already
+    satisfied.
+    """
+    pending = {
+        task.get("index", position): task
+        for position, task in enumerate(tasks)
+    }
+    layers = []
+    while pending:
+        ready = [
+            index for index, task in pending.items()
+            if not any(
+                int(dep) in pending and int(dep) != index
+                for dep in (task.get("dependencies") or [])
+                if str(dep).isdigit()
+            )
+        ]
+        if not ready:
+            # Unresolvable dependencies; run the remainder together
+            ready = list(pending)
+        layers.append([pending.pop(index) for index in ready])
+    return layers
+
+
 async def sql_agent_node(state: InputState, config: RunnableConfig) -> Dict[str, Any]:
     """SQL agent node that processes SQL-related tasks from the supervisor."""
     try:
         # Get the last message which contains the task analysis
-        last_message = state["messages"][-1]["content"]
-        task_analysis = json.loads(last_message)
-        
+        last_message = decode_message(state["messages"][-1]).content
+        task_analysis = orjson.loads(last_message)
+
+        # Find SQL tasks before building the agent so a branch with
+        # nothing to do never touches SQLite
+        sql_tasks = [task for task in task_analysis["tasks"] if task["agent"] == "sql_agent"]
+        if not sql_tasks:
+            return {"results": [{"status": "skipped", "sql_results": []}]}
+
         # Initialize SQL agent
         db_path = os.path.join(os.path.dirname(__file__), "sales.db")
         sql_agent = SQLAgent(db_path)
-        
-        # Find SQL tasks
-        sql_tasks = [task for task in task_analysis["tasks"] if task["agent"] == "sql_agent"]
-        
-        results = []
-        for task in sql_tasks:
+
+        semaphore = asyncio.Semaphore(int(os.getenv("SQL_CONCURRENCY", "8")))
+
+        # Generate SQL for all tasks in one LLM call; keyed by task
+        # identity since the dependency layers reorder the task dicts
+        queries = await sql_agent.generate_many(
+            [task["taskDefinition"] for task in sql_tasks]
+        )
+        query_for_task = {
+            id(task): query for task, query in zip(sql_tasks, queries)
+        }
+
+        async def _run_one(task: Dict[str, Any]) -> Dict[str, Any]:
             try:
                 # Execute the SQL task and await the result
-                result = await sql_agent.execute_query(task["taskDefinition"])
+                async with semaphore:
+                    result = await sql_agent.execute_query(
+                        task["taskDefinition"],
+                        sql_query=query_for_task.get(id(task))
+                    )
                 # Ensure the result is a dictionary, not a coroutine
                 if isinstance(result, dict):
-                    results.append({
-                        "task": task,
-                        "result": result
-                    })
-                else:
-                    logger.error(f"Unexpected result type: {type(result)}")
-                    results.append({
-                        "task": task,
-                        "error": "Invalid result type from SQL agent"
-                    })
+                    return {"task": task, "result": result}
+                logger.error(f"Unexpected result type: {type(result)}")
+                return {"task": task, "error": "Invalid result type from SQL agent"}
             except Exception as e:
                 logger.error(f"Error executing SQL task: {str(e)}", exc_info=True)
-                results.append({
-                    "task": task,
-                    "error": str(e)
-                })
-        
+                return {"task": task, "error": str(e)}
+
+        # Run independent tasks concurrently, one dependency layer at a time
+        results = []
+        for layer in _dependency_layers(sql_tasks):
+            results.extend(await asyncio.gather(*[_run_one(task) for task in layer]))
+
         # Close the SQL agent connection
         sql_agent.close()
-        
-        # Create the output state with results
-        output_state = {
-            "messages": [
+
+        # Contribute this branch's results; the merge node combines branches
+        return {
+            "results": [
                 {
-                    "role": "assistant",
-                    "content": json.dumps({
-                        "status": "success",
-                        "sql_results": results,
-                        "original_analysis": task_analysis
-                    }, indent=2)
+                    "sql_results": results,
+                    "original_analysis": task_analysis
                 }
             ]
         }
-        
-        return output_state
     except Exception as e:
         logger.error(f"Error in sql_agent_node: {str(e)}", exc_info=True)
         return {
-            "messages": [
+            "results": [
                 {
-                    "role": "assistant",
-                    "content": json.dumps({
-                        "status": "error",
-                        "error": f"Failed to process SQL tasks: {str(e)}",
-                        "retry_count": 0
-                    }, indent=2)
+                    "status": "error",
+                    "sql_error": f"Failed to process SQL tasks: {str(e)}"
                 }
             ]
         }
@@ -271,74 +410,77 @@ async def nosql_agent_node(state: InputState, config: RunnableConfig) -> Dict[st
     """NoSQL agent node that processes NoSQL-related tasks from the supervisor."""
     try:
         # Get the last message which contains the task analysis
-        last_message = state["messages"][-1]["content"]
-        task_analysis = json.loads(last_message)
+        last_message = decode_message(state["messages"][-1]).content
+        task_analysis = orjson.loads(last_message)
         
+        # Find NoSQL tasks before building the agent so a pure-SQL request
+        # never opens a Mongo connection
+        nosql_tasks = [task for task in task_analysis["tasks"] if task["agent"] == "nosql_agent"]
+        if not nosql_tasks:
+            return {"results": [{"status": "skipped", "nosql_results": []}]}
+
         # Initialize NoSQL agent using the GeneralizedNoSQLAgent class
         nosql_connection_string = os.getenv("NOSQL_CONNECTION_STRING", "mongodb://localhost:27017")
         database_name = os.getenv("NOSQL_DATABASE", "user_management_db")
         nosql_agent = GeneralizedNoSQLAgent(nosql_connection_string, database_name)
-        
-        # Find NoSQL tasks
-        nosql_tasks = [task for task in task_analysis["tasks"] if task["agent"] == "nosql_agent"]
-        
-        results = []
-        for task in nosql_tasks:
+
+        semaphore = asyncio.Semaphore(int(os.getenv("NOSQL_CONCURRENCY", "8")))
+
+        async def _run_one(task: Dict[str, Any]) -> Dict[str, Any]:
             try:
-                # Execute the NoSQL task
-                result = nosql_agent.execute_query(task["taskDefinition"])
-                
+                # Execute the NoSQL task natively async via Motor
+                async with semaphore:
+                    result = await nosql_agent.execute_query(task["taskDefinition"])
+
                 # Ensure the result is a dictionary
                 if isinstance(result, dict):
-                    # Convert to JSON serializable format using MongoJSONEncoder
-                    result_str = json.dumps(result, cls=MongoJSONEncoder)
-                    result_dict = json.loads(result_str)
-                    
-                    results.append({
-                        "task": task,
-                        "result": result_dict
-                    })
-                else:
-                    logger.error(f"Unexpected result type: {type(result)}")
-                    results.append({
-                        "task": task,
-                        "error": "Invalid result type from NoSQL agent"
-                    })
+                    # Round-trip through orjson to normalize ObjectId/datetime
+                    return {"task": task, "result": orjson.loads(_json(result))}
+                logger.error(f"Unexpected result type: {type(result)}")
+                return {"task": task, "error": "Invalid result type from NoSQL agent"}
             except Exception as e:
                 logger.error(f"Error executing NoSQL task: {str(e)}", exc_info=True)
-                results.append({
-                    "task": task,
-                    "error": str(e)
-                })
-        
-        nosql_agent.close()
-        
-        # Create the output state with results
-        output_state = {
-            "messages": [
+                return {"task": task, "error": str(e)}
+
+        # Run independent tasks concurrently, one dependency layer at a time
+        results = []
+        for layer in _dependency_layers(nosql_tasks):
+            results.extend(await asyncio.gather(*[_run_one(task) for task in layer]))
+
+        # Contribute this branch's results; the merge node combines branches
+        return {
+            "results": [
                 {
-                    "role": "assistant",
-                    "content": json.dumps({
-                        "status": "success",
-                        "nosql_results": results,
-                        "original_analysis": task_analysis
-                    }, indent=2)
+                    "nosql_results": results,
+                    "original_analysis": task_analysis
                 }
             ]
         }
-        
-        return output_state
     except Exception as e:
         logger.error(f"Error in nosql_agent_node: {str(e)}", exc_info=True)
         return {
-            "messages": [
+            "results": [
                 {
-                    "role": "assistant",
-                    "content": json.dumps({
-                        "status": "error",
-                        "error": f"Failed to process NoSQL tasks: {str(e)}",
-                        "retry_count": 0
-                    }, indent=2)
+                    "status": "error",
+                    "nosql_error": f"Failed to process NoSQL tasks: {str(e)}"
                 }
             ]
-        }
\ No newline at end of file
+        }
+
+
+async def merge_results_node(state: InputState, config: RunnableConfig) -> Dict[str, Any]:
+    """Merge node that combines the parallel SQL and NoSQL branch outputs."""
+    combined: Dict[str, Any] = {"status": "success"}
+    for branch in state.get("results", []):
+        if branch.get("status") == "error":
+            combined["status"] = "error"
+        combined.update({key: value for key, value in branch.items() if key != "status"})
+
+    return {
+        "messages": [
+            {
+                "role": "assistant",
+                "content": _json(combined)
+            }
+        ]
+    }
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Disk-backed LLM response cache shared across worker processes."""
+
+import os
+import time
+from typing import Any, Optional
+
+import orjson
+
+from agent.utils.logger import setup_logger
+from agent.utils.sqlite_pool import get_pool
+
+# Initialize logger
+logger = setup_logger('persistent_cache')
+
+# How long a cached supervisor output stays servable
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+
+
+class PersistentLLMCache:
+    """SQLite-backed cache of full LLM outputs keyed by prompt hash.
+
+    Sits behind the in-process cache as a second tier: entries survive
+    restarts, and multiple worker processes sharing the database file
+    deduplicate LLM calls through WAL-mode concurrent reads. Lookups and
+    stores degrade to a miss/no-op on any storage error.
+    """
+
+    def __init__(self, db_path: Optional[str] = None,
+                 ttl: float = CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self.db_path = db_path or os.path.join(
+            os.path.dirname(__file__), "llm_cache.db"
+        )
+        try:
+            self._pool = get_pool(self.db_path)
+            with self._pool.acquire_writer() as conn:
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS llm_cache (
+                        hash BLOB PRIMARY KEY,
+                        prompt_version TEXT,
+                        response BLOB,
+                        created_at REAL,
+                        expires_at REAL
+                    )"""
+                )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not initialize persistent LLM cache: {str(e)}")
+            self._pool = None
+
+    def lookup(self, key: bytes) -> Optional[Any]:
+        """Return the cached object for key, or None on a miss."""
+        if self._pool is None:
+            return None
+        try:
+            with self._pool.acquire_reader() as conn:
+                row = conn.execute(
+                    "SELECT response FROM llm_cache WHERE hash = ? AND expires_at > ?",
+                    (key, time.time()),
+                ).fetchone()
+            if row is None:
+                return None
+            logger.info("Persistent LLM cache hit")
+            return orjson.loads(row[0])
+        except Exception as e:
+            logger.warning(f"Persistent cache lookup failed: {str(e)}")
+            return None
+
+    def store(self, key: bytes, prompt_version: str, value: Any):
+        """Persist value under key with the cache's TTL."""
+        if self._pool is None:
+            return
+        try:
+            now = time.time()
+            with self._pool.acquire_writer() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        prompt_version,
+                        orjson.dumps(value, default=str),
+                        now,
+                        now + self.ttl,
+                    ),
+                )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not persist LLM cache entry: {str(e)}")
@@ -0,0 +1,57 @@
+"""In-process TTL cache for database schema lookups."""
+
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Cache entries keyed by data source (db_path / mongo URI), holding the
+# monotonic timestamp of the last load alongside the loaded schema.
+_SCHEMA_CACHE: Dict[str, Tuple[float, Any]] = {}
+_SCHEMA_TTL = 300.0
+
+
+def cached_schema(key: str, loader: Callable[[], Any]) -> Any:
+    """Return the schema for key, reloading via loader when the TTL expires.
+
+    Args:
+        key: Cache key identifying the data source (e.g. db_path or mongo URI)
+        loader: Zero-argument callable that fetches the schema on a cache miss
+
+    Returns:
+        The cached (or freshly loaded) schema
+    """
+    timestamp, value = _SCHEMA_CACHE.get(key, (0.0, None))
+    if time.monotonic() - timestamp < _SCHEMA_TTL:
+        return value
+    value = loader()
+    _SCHEMA_CACHE[key] = (time.monotonic(), value)
+    return value
+
+
+async def cached_schema_async(key: str, loader: Callable[[], Any]) -> Any:
+    """Async counterpart of cached_schema for coroutine loaders.
+
+    Args:
+        key: Cache key identifying the data source (e.g. db_path or mongo URI)
+        loader: Zero-argument coroutine function that fetches the schema
+
+    Returns:
+        The cached (or freshly loaded) schema
+    """
+    timestamp, value = _SCHEMA_CACHE.get(key, (0.0, None))
+    if time.monotonic() - timestamp < _SCHEMA_TTL:
+        return value
+    value = await loader()
+    _SCHEMA_CACHE[key] = (time.monotonic(), value)
+    return value
+
+
+def invalidate_schema_cache(key: Optional[str] = None) -> None:
+    """Drop cached schemas so the next lookup re-reads the database.
+
+    Args:
+        key: Specific cache key to drop; drops all entries when omitted
+    """
+    if key is None:
+        _SCHEMA_CACHE.clear()
+    else:
+        _SCHEMA_CACHE.pop(key, None)
@@ -1,44 +1,123 @@
-import sqlite3
-from typing import Dict, Any
+import os
+import asyncio
+import aiosqlite
+import sqlglot
+from sqlglot import exp
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, Field
+from agent.utils.executors import run_in_llm_pool
 from agent.utils.llm_config import llm
 from agent.utils.logger import default_logger as logger
-import asyncio
-from contextlib import contextmanager
+from agent.utils.schema_cache import cached_schema_async, invalidate_schema_cache
+from agent.utils.sqlite_pool import PRAGMAS
+
+
+class SQLQuery(BaseModel):
+    """Structured output schema for generated SQL."""
+    query: str = Field(description="A single SQL query compatible with SQLite syntax")
+
+
+class SQLQueryBatch(BaseModel):
+    """Structured output schema for batch SQL generation."""
+    queries: List[str] = Field(
+        description="SQL queries compatible with SQLite syntax, one per task, in task order"
+    )
+
+
+# Structured output removes free-form responses (stray backticks, prose)
+# that previously broke downstream execution
+_sql_query_llm = llm.with_structured_output(SQLQuery, method="function_calling")
+_sql_batch_llm = llm.with_structured_output(SQLQueryBatch, method="function_calling")
+
+# Cap on rows returned by generated SELECTs without an explicit LIMIT
+MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "10000"))
+
+
+def _cap_select_rows(sql: str) -> str:
+    """Append LIMIT MAX_ROWS to a SELECT that doesn't already declare one."""
+    try:
+        expression = sqlglot.parse_one(sql, read="sqlite")
+    except Exception:
+        return sql
+    if isinstance(expression, exp.Select) and expression.args.get("limit") is None:
+        return expression.limit(MAX_ROWS).sql(dialect="sqlite")
+    return sql
+
 
 class SQLAgent:
     def __init__(self, db_path: str):
         self.db_path = db_path
         logger.info(f"Initializing SQLAgent with database: {db_path}")
-    
-    @contextmanager
-    def _get_connection(self):
-        """Create a new connection for each operation."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+
+    async def _connect(self, readonly: bool = False) -> aiosqlite.Connection:
+        """Open an aiosqlite connection with the WAL PRAGMAs applied.
+
+        One connection per query is the accepted cost here: opening a
+        local SQLite file is cheap next to the LLM round-trip, and it
+        sidesteps binding pooled async connections to an event loop.
+        Read-only connections open the database in mode=ro so a
+        misclassified query cannot write.
+        """
+        if readonly:
+            conn = await aiosqlite.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        else:
+            conn = await aiosqlite.connect(self.db_path)
         try:
-            yield conn
-        finally:
-            conn.close()
-    
+            conn.row_factory = aiosqlite.Row
+            for pragma in PRAGMAS:
+                # journal_mode=WAL writes to the database file; it persists
+                # there, so read-write connections set it for everyone and
+                # readonly connections must skip it
+                if readonly and "journal_mode" in pragma:
+                    continue
+                await conn.execute(pragma)
+        except BaseException:
+            # An unclosed aiosqlite connection leaves a non-daemon worker
+            # thread behind that keeps the process alive
+            await conn.close()
+            raise
+        return conn
+
     def _is_read_query(self, sql: str) -> bool:
-        """Determine if a query is read-only."""
-        normalized_sql = sql.strip().upper()
-        return (normalized_sql.startswith("SELECT") or 
-                normalized_sql.startswith("PRAGMA") or
-                normalized_sql.startswith("EXPLAIN"))
-        
+        """Determine if a query is read-only by parsing it, not prefix matching.
+
+        Parsing correctly classifies CTEs (WITH ... SELECT) that prefix
+        matching missed. Statements sqlglot cannot parse are treated as
+        writes, the conservative choice.
+        """
+        try:
+            expressions = [e for e in sqlglot.parse(sql, read="sqlite") if e is not None]
+        except Exception:
+            return False
+        if not expressions:
+            return False
+        for expression in expressions:
+            if isinstance(expression, (exp.Select, exp.Pragma)):
+                continue
+            # EXPLAIN falls back to a generic Command node; only that
+            # command is read-only, not arbitrary ones (e.g. VACUUM)
+            if isinstance(expression, exp.Command) and \
+                    expression.sql().strip().upper().startswith("EXPLAIN"):
+                continue
+            return False
+        return True
+
     async def _get_table_schema(self) -> str:
         """Get the schema of the database tables."""
         logger.debug("Fetching database schema")
-        
-        def _fetch_schema():
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT sql FROM sqlite_master WHERE type='table'")
-                schemas = cursor.fetchall()
+
+        async def _fetch_schema():
+            conn = await self._connect(readonly=True)
+            try:
+                cursor = await conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type='table'"
+                )
+                schemas = await cursor.fetchall()
                 return "\n".join([schema[0] for schema in schemas])
-            
-        return await asyncio.to_thread(_fetch_schema)
+            finally:
+                await conn.close()
+
+        return await cached_schema_async(f"sqlite:{self.db_path}", _fetch_schema)
     
     async def _generate_sql_query(self, prompt: str) -> str:
         """Generate SQL query using LLM based on the prompt and schema."""
@@ -57,47 +136,103 @@ class SQLAgent:
             {"role": "user", "content": prompt}
         ]
         
-        response = await asyncio.to_thread(llm.invoke, messages)
-        generated_query = response.content.strip()
+        response = await run_in_llm_pool(_sql_query_llm.invoke, messages)
+        generated_query = response.query.strip()
         logger.debug(f"Generated SQL query: {generated_query}")
         return generated_query
-    
-    async def execute_query(self, prompt: str) -> Dict[str, Any]:
-        """Execute a query based on the natural language prompt."""
+
+    async def generate_many(self, prompts: List[str]) -> List[str]:
+        """Generate SQL for several prompts with a single LLM call.
+
+        The schema travels once instead of once per task, and one
+        round-trip replaces N. Falls back to concurrent per-prompt
+        generation if the batch response doesn't line up with the tasks.
+        """
+        if not prompts:
+            return []
+        if len(prompts) == 1:
+            return [await self._generate_sql_query(prompts[0])]
+
+        logger.debug(f"Generating SQL for a batch of {len(prompts)} prompts")
+        schema = await self._get_table_schema()
+        system_prompt = f"""You are a SQL expert. Given the following database schema:
+        {schema}
+
+        Generate one valid SQL query per numbered task below, in the same order as the tasks.
+        Only return the SQL queries without any explanation.
+        Each query should be compatible with SQLite syntax.
+        For date fields, use the format 'YYYY-MM-DD'.
+        Make sure to properly escape string values and handle NULL values appropriately."""
+
+        task_list = "\n".join(
+            f"{index + 1}. {prompt}" for index, prompt in enumerate(prompts)
+        )
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": task_list}
+        ]
+
+        try:
+            response = await run_in_llm_pool(_sql_batch_llm.invoke, messages)
+            queries = [query.strip() for query in response.queries]
+            if len(queries) == len(prompts):
+                return queries
+            logger.warning(
+                f"Batch SQL generation returned {len(queries)} queries for "
+                f"{len(prompts)} tasks; regenerating individually"
+            )
+        except Exception as e:
+            logger.warning(f"Batch SQL generation failed, regenerating individually: {str(e)}")
+        return list(await asyncio.gather(
+            *[self._generate_sql_query(prompt) for prompt in prompts]
+        ))
+
+    async def execute_query(self, prompt: str,
+                            sql_query: Optional[str] = None) -> Dict[str, Any]:
+        """Execute a query based on the natural language prompt.
+
+        Accepts pre-generated SQL (from generate_many) to skip the
+        per-call generation step.
+        """
         try:
             logger.info(f"Executing query for prompt: {prompt}")
-            # Generate SQL query from the prompt
-            sql_query = await self._generate_sql_query(prompt)
-            
-            def _execute_and_fetch():
-                with self._get_connection() as conn:
-                    cursor = conn.cursor()
-                    # Execute the query
-                    cursor.execute(sql_query)
-                    
-                    # Handle different types of queries
-                    if sql_query.strip().upper().startswith(('SELECT', 'PRAGMA')):
-                        results = cursor.fetchall()
-                        columns = [description[0] for description in cursor.description]
-                        logger.info(f"Query executed successfully. Retrieved {len(results)} rows")
-                        return {
-                            "status": "success",
-                            "query": sql_query,
-                            "results": [dict(zip(columns, row)) for row in results]
-                        }
-                    else:
-                        # For INSERT, UPDATE, DELETE operations
-                        conn.commit()
-                        logger.info(f"Query executed successfully. Rows affected: {cursor.rowcount}")
-                        return {
-                            "status": "success",
-                            "query": sql_query,
-                            "message": f"Query executed successfully. Rows affected: {cursor.rowcount}"
-                        }
-            
-            # Run the blocking operation in a thread and await its result
-            result = await asyncio.to_thread(_execute_and_fetch)
-            return result
+            # Generate SQL query from the prompt unless one was supplied
+            if sql_query is None:
+                sql_query = await self._generate_sql_query(prompt)
+            sql_query = _cap_select_rows(sql_query)
+
+            # Classify once so reads get a mode=ro connection and writes
+            # the read-write one
+            is_read = self._is_read_query(sql_query)
+            conn = await self._connect(readonly=is_read)
+            try:
+                cursor = await conn.execute(sql_query)
+
+                # Handle different types of queries
+                if is_read:
+                    columns = [description[0] for description in cursor.description]
+                    # Build dicts while iterating the cursor so the result
+                    # set is materialized once, not twice
+                    results = [dict(zip(columns, row)) async for row in cursor]
+                    logger.info(f"Query executed successfully. Retrieved {len(results)} rows")
+                    return {
+                        "status": "success",
+                        "query": sql_query,
+                        "results": results
+                    }
+                else:
+                    # For INSERT, UPDATE, DELETE operations
+                    await conn.commit()
+                    # Writes may alter DDL, so bust the cached schema
+                    invalidate_schema_cache(f"sqlite:{self.db_path}")
+                    logger.info(f"Query executed successfully. Rows affected: {cursor.rowcount}")
+                    return {
+                        "status": "success",
+                        "query": sql_query,
+                        "message": f"Query executed successfully. Rows affected: {cursor.rowcount}"
+                    }
+            finally:
+                await conn.close()
                 
         except Exception as e:
             logger.error(f"Error executing query: {str(e)}", exc_info=True)
@@ -108,7 +243,7 @@ class SQLAgent:
             }
     
     def close(self):
-        """No-op since connections are managed per-query."""
+        """No-op: execute_query opens and closes its own connection."""
         pass
 
 # async def main():
@@ -0,0 +1,78 @@
+"""Process-wide SQLite connection pooling with WAL mode."""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from agent.utils.logger import setup_logger
+
+# Initialize logger
+logger = setup_logger('sqlite_pool')
+
+# Applied to every pooled connection; WAL allows concurrent readers while
+# a single writer appends to the log
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=memory",
+    "PRAGMA cache_size=-64000",
+)
+
+
+class SqlitePool:
+    """Pool of reader connections plus a single writer for one database file."""
+
+    def __init__(self, db_path: str, readers: int = 4):
+        self.db_path = db_path
+        self._readers = queue.Queue()
+        for _ in range(readers):
+            self._readers.put(self._connect())
+        self._writer = self._connect()
+        self._writer_lock = threading.Lock()
+        logger.info(f"Initialized SQLite pool for {db_path} with {readers} readers")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with the pool's PRAGMAs applied."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def acquire_reader(self):
+        """Borrow a reader connection, blocking until one is free."""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def acquire_writer(self):
+        """Borrow the writer connection, serializing concurrent writers."""
+        with self._writer_lock:
+            yield self._writer
+
+    def close(self):
+        """Close all pooled connections."""
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        self._writer.close()
+
+
+# Process-wide pools keyed by database path
+_POOLS: Dict[str, SqlitePool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(db_path: str, readers: int = 4) -> SqlitePool:
+    """Return the process-wide pool for db_path, creating it on first use."""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(db_path)
+        if pool is None:
+            pool = SqlitePool(db_path, readers=readers)
+            _POOLS[db_path] = pool
+        return pool
@@ -1,17 +1,66 @@
 """State schema definitions for the agent."""
 
-from typing import TypedDict, List, Dict, Any
+from typing import Annotated, TypedDict, List, Dict, Any
 
+import msgspec
+
+
+class Message(msgspec.Struct, frozen=True):
+    """Message structure for chat.
+
+    A msgspec.Struct rather than a dict: construction and (de)serialization
+    are roughly an order of magnitude cheaper, which matters once large
+    agent payloads flow through the graph state.
+    """
 
-class Message(TypedDict):
-    """Message structure for chat."""
     role: str
     content: str
 
+    def as_dict(self) -> Dict[str, str]:
+        """Return a plain dict for LangChain/LangGraph boundary calls."""
+        return {"role": self.role, "content": self.content}
+
+
+def decode_message(value: Any) -> Message:
+    """Coerce a mapping (or an existing Message) into a Message struct."""
+    if isinstance(value, Message):
+        return value
+    return Message(role=value["role"], content=value["content"])
+
+# Marker the supervisor writes at the start of each turn; a plain dict so
+# it survives checkpointer round-trips, matched by key rather than identity
+RESULTS_RESET: Dict[str, Any] = {"__reset__": True}
+
+
+def reduce_results(existing: List[Dict[str, Any]],
+                   update: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reducer for the results channel.
+
+    Appends branch payloads like operator.add, but a reset marker
+    discards everything written before it. Under a checkpointer the
+    channel persists across conversation turns; without the reset, old
+    branch payloads would be re-merged every turn and a single stale
+    error entry would pin the combined status to error forever.
+    """
+    combined = list(existing or []) + list(update or [])
+    for position in range(len(combined) - 1, -1, -1):
+        entry = combined[position]
+        if isinstance(entry, dict) and entry.get("__reset__"):
+            return combined[position + 1:]
+    return combined
+
 
 class InputState(TypedDict):
-    """Input state for the agent."""
+    """Input state for the agent.
+
+    The top-level state stays a TypedDict because LangGraph resolves
+    reducer annotations (and merges concurrent branch updates) through it.
+    """
+
     messages: List[Message]
+    # Accumulates per-branch agent outputs when SQL and NoSQL run in
+    # parallel; reset by the supervisor at the start of each turn
+    results: Annotated[List[Dict[str, Any]], reduce_results]
 
 
 class OutputState(TypedDict):
@@ -22,4 +71,4 @@ class OutputState(TypedDict):
 class Configuration(TypedDict):
     """Configurable parameters for the agent."""
     temperature: float
-    model_name: str 
\ No newline at end of file
+    model_name: str